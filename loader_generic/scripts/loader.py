@@ -9,6 +9,8 @@ import configparser
 import os
 import logging
 import re
+import shutil
+import threading
 import time
 import sys
 
@@ -38,6 +40,15 @@ class Config:
         self.sqlldr_log_dir = os.path.join(self.base_dir, 'log')
         self.sqlldr_ctl_dir = os.path.join(self.base_dir, 'var')
         self.sqlldr_backup_dir = os.path.join(self.base_dir, 'sqlldr')
+
+        # Optional local staging folder for the input files of the next flow,
+        # and the disk budget (in MB) it may use
+        self.stage_dir = None
+        if self.c.has_option('global', 'stage_dir') and self.c.get('global', 'stage_dir').strip():
+            self.stage_dir = os.path.join(self.base_dir, self.c.get('global', 'stage_dir').strip())
+        self.stage_max_mb = 1024
+        if self.c.has_option('global', 'stage_max_mb'):
+            self.stage_max_mb = self.c.getint('global', 'stage_max_mb')
         
         # Define pid file name
         self.pidfname = os.path.join(self.var_dir, 'loader_generic.pid')
@@ -223,19 +234,213 @@ class Flow:
             self.files.sort()
         self.log.info('%s: found %d file(s) to load' % (self.name, len(self.files)))
     
-    def load(self, loader):
+    def load(self, loader, files=None):
         """
         Loads the data of this flow using the provided loader.
         loader: Loader instance, stores all sqlldr-specific params
+        files: paths to give to sqlldr instead of self.files (e.g. staged copies)
         """
+        if files is None:
+            files = self.files
         loader.reset()
         loader.load(
             suffix=self.name, field_names=self.field_names,
-            files=self.files, database=self.database,
+            files=files, database=self.database,
             loadtable=self.loadtable, delimiter=self.delimiter
         )
 
 
+class Stager:
+    """
+    Prepares the input files of a flow in a background thread while
+    another flow is being loaded.
+
+    With a stage_dir, files are copied to <stage_dir>/<job id>.<flow name>/
+    as long as the total size of staged files stays below max_bytes; files
+    which do not fit are loaded from their original location. Without a
+    stage_dir, or for files which were not copied, the kernel is asked to
+    read the files ahead into the page cache (posix_fadvise WILLNEED).
+    """
+    def __init__(self, log, stage_dir=None, max_bytes=0):
+        """
+        log : logger instance
+        stage_dir : local folder where to copy the input files, None to only read ahead
+        max_bytes : maximum total size of the files in stage_dir at any time
+        """
+        self.log = log
+        self.stage_dir = stage_dir
+        self.max_bytes = max_bytes
+
+        # Bytes currently reserved in stage_dir, shared with the worker threads
+        self.used_bytes = 0
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+        # Key: job id, value: (worker thread, job stage folder,
+        # dict original path -> (staged path, reserved bytes))
+        self.jobs = {}
+
+    def prefetch(self, job_id, flow):
+        """
+        Starts staging flow.files in the background.
+        job_id: unique key of this load of the flow, e.g. its position in the flow list
+        """
+        job_stage_dir = None
+        if self.stage_dir:
+            job_stage_dir = os.path.join(self.stage_dir, '%s.%s' % (job_id, flow.name))
+        staged = {}
+        worker = threading.Thread(
+            target=self._stage, args=(flow.name, list(flow.files), job_stage_dir, staged),
+            name='stage-%s' % job_id
+        )
+        worker.daemon = True
+        self.jobs[job_id] = (worker, job_stage_dir, staged)
+        worker.start()
+
+    def wait(self, job_id, flow):
+        """
+        Waits for the staging of job_id to be done, returns the list of
+        paths to load, in the order of flow.files
+        """
+        try:
+            worker, job_stage_dir, staged = self.jobs[job_id]
+        except KeyError:
+            return flow.files
+        worker.join()
+        return [staged.get(fname, (fname, 0))[0] for fname in flow.files]
+
+    def cleanup(self, job_id):
+        """
+        Removes the staged copies of a job and releases their disk budget
+        """
+        try:
+            worker, job_stage_dir, staged = self.jobs.pop(job_id)
+        except KeyError:
+            return
+        worker.join()
+        for staged_fname, size in staged.values():
+            try:
+                os.remove(staged_fname)
+            except OSError as e:
+                self.log.warning('%s: cannot remove staged file "%s": %s' % (job_id, staged_fname, e))
+                continue
+            with self.lock:
+                self.used_bytes -= size
+        if job_stage_dir:
+            try:
+                os.rmdir(job_stage_dir)
+            except OSError:
+                pass
+
+    def close(self):
+        """
+        Stops the pending staging and removes all staged files
+        """
+        self.stop.set()
+        for job_id in list(self.jobs):
+            self.cleanup(job_id)
+
+    def _stage(self, flow_name, files, job_stage_dir, staged):
+        """
+        Worker thread: copies or reads ahead each file, updates staged
+        """
+        start_time = time.time()
+        if job_stage_dir and not self._make_stage_dir(flow_name, job_stage_dir):
+            job_stage_dir = None
+
+        for fname in files:
+            if self.stop.is_set():
+                break
+            if not (job_stage_dir and self._copy(flow_name, fname, job_stage_dir, staged)):
+                self._readahead(fname)
+
+        self.log.debug('%s: staged %d file(s), copied %d in %.3f sec' % (
+            flow_name, len(files), len(staged), time.time() - start_time
+        ))
+
+    def _make_stage_dir(self, flow_name, job_stage_dir):
+        """
+        Creates an empty job_stage_dir, removing what a previous run may
+        have left in it, returns False if it cannot be used
+        """
+        try:
+            if os.path.isdir(job_stage_dir):
+                self.log.warning('%s: removing leftover stage folder "%s"' % (flow_name, job_stage_dir))
+                shutil.rmtree(job_stage_dir)
+            os.makedirs(job_stage_dir)
+        except OSError as e:
+            self.log.warning('%s: cannot create stage folder "%s": %s' % (flow_name, job_stage_dir, e))
+            return False
+        return True
+
+    def _reserve(self, size):
+        """
+        Reserves size bytes of the disk budget, returns False if it does not fit
+        """
+        with self.lock:
+            if self.used_bytes + size > self.max_bytes:
+                return False
+            self.used_bytes += size
+            return True
+
+    def _release(self, size):
+        with self.lock:
+            self.used_bytes -= size
+
+    def _copy(self, flow_name, fname, job_stage_dir, staged):
+        """
+        Copies fname to job_stage_dir if it fits in the disk budget,
+        returns True if the copy is to be loaded
+        """
+        try:
+            size = os.path.getsize(fname)
+        except OSError as e:
+            self.log.warning('%s: cannot stage "%s": %s' % (flow_name, fname, e))
+            return False
+
+        if not self._reserve(size):
+            return False
+
+        staged_fname = os.path.join(job_stage_dir, os.path.basename(fname))
+        try:
+            shutil.copyfile(fname, staged_fname)
+            # The file may have grown while being copied
+            extra = os.path.getsize(staged_fname) - size
+            if extra > 0:
+                if not self._reserve(extra):
+                    raise OSError('file grew beyond the stage budget')
+                size += extra
+        except (IOError, OSError) as e:
+            self.log.warning('%s: cannot copy "%s" to "%s": %s' % (flow_name, fname, staged_fname, e))
+            try:
+                os.remove(staged_fname)
+            except OSError:
+                pass
+            self._release(size)
+            return False
+
+        staged[fname] = (staged_fname, size)
+        return True
+
+    @staticmethod
+    def _readahead(fname):
+        """
+        Asks the kernel to read fname into the page cache, when supported
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            fd = os.open(fname, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
 class LoadError(Exception):
     def __init__(self, log, level, msg):
         super(LoadError, self).__init__(msg)
@@ -588,15 +793,37 @@ def main():
         conf.log, conf.sqlldr_bin, conf.sqlldr_log_dir,
         conf.sqlldr_ctl_dir, conf.sqlldr_backup_dir, conf.sqlldr_max_error
     )
+    stager = Stager(conf.log, conf.stage_dir, conf.stage_max_mb * 1024 * 1024)
     try:
-        for flow in conf.flow_list:
-            try:
+        # While a flow is loading, the files of the next one are staged.
+        # The first flow has nothing to overlap with and is loaded in place.
+        flow_list = conf.flow_list
+        prefetched = False
+        for i, flow in enumerate(flow_list):
+            if prefetched:
+                files = stager.wait(i, flow)
+            else:
                 flow.list_files()
-                flow.load(loader)
+                files = flow.files
+
+            prefetched = False
+            if i + 1 < len(flow_list):
+                try:
+                    flow_list[i + 1].list_files()
+                    stager.prefetch(i + 1, flow_list[i + 1])
+                    prefetched = True
+                except OSError as e:
+                    conf.log.warning('%s: cannot list files to stage: %s' % (flow_list[i + 1].name, e))
+
+            try:
+                flow.load(loader, files)
             except LoadError:
                 conf.log.info('Got load error, continuing with next flow (if any)')
+            finally:
+                stager.cleanup(i)
 
     finally:
+        stager.close()
         conf.delPid()
         conf.log.info('All Done!')
 